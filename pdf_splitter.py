@@ -1,28 +1,64 @@
 import fitz  # PyMuPDF
 import argparse
 import os
-import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+# Characters that are invalid in filenames, mapped to None for str.translate
+_SANITIZE_TABLE = str.maketrans({c: None for c in '\\/*?:"<>|'})
 
 def sanitize_filename(filename):
     """
     Sanitize the filename by removing invalid characters.
     """
     # Remove invalid characters for filenames
-    s = re.sub(r'[\\/*?:"<>|]', "", filename)
+    s = filename.translate(_SANITIZE_TABLE)
     # Replace spaces with underscores and strip whitespace
     s = s.strip().replace(" ", "_")
     return s
 
+# Raw bytes of the source PDF, set once per worker process.
+_src_bytes = None
+
+def _init_worker(src_bytes):
+    """
+    Store the source PDF bytes in the worker process.
+    """
+    global _src_bytes
+    _src_bytes = src_bytes
+
+def _extract_section(section):
+    """
+    Extract a single section into its own PDF file.
+    Runs in a worker process: opens a clone of the in-memory source and
+    keeps only the section's pages, so save() writes just what they reference.
+    """
+    new_doc = fitz.open("pdf", _src_bytes)
+    new_doc.select(list(range(section['start'], section['end'] + 1)))
+
+    # Write through a 1 MiB buffer rather than many small writes.
+    # garbage=4 also merges duplicate streams shared between pages.
+    with open(section['output_path'], "wb", buffering=1 << 20) as f:
+        new_doc.save(f, garbage=4, deflate=True, deflate_images=True,
+                     deflate_fonts=True, clean=True)
+    new_doc.close()
+    # MuPDF keeps parsed objects in a process-wide store; empty it so a
+    # long-lived worker doesn't grow with every section it handles.
+    fitz.TOOLS.store_shrink(100)
+    return section['output_path']
+
 def split_pdf_by_toc(input_pdf_path, output_dir, deep=False):
     """
     Splits a PDF based on its Table of Contents.
     """
-    if not os.path.exists(input_pdf_path):
+    try:
+        # Read the whole file once; everything after works on the in-memory copy.
+        with open(input_pdf_path, "rb", buffering=1 << 20) as f:
+            pdf_bytes = f.read()
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except FileNotFoundError:
         print(f"Error: File '{input_pdf_path}' not found.")
         return
-
-    try:
-        doc = fitz.open(input_pdf_path)
     except Exception as e:
         print(f"Error opening PDF: {e}")
         return
@@ -41,23 +77,31 @@ def split_pdf_by_toc(input_pdf_path, output_dir, deep=False):
     # Filter ToC based on mode
     if not deep:
         # Find the top-most level (usually 1, but could be different)
-        min_level = min(entry[0] for entry in toc)
+        # and collect its entries in the same pass.
+        min_level = toc[0][0]
+        filtered = []
+        for entry in toc:
+            level = entry[0]
+            if level < min_level:
+                # New top level: everything collected so far was deeper.
+                min_level = level
+                filtered = [entry]
+            elif level == min_level:
+                filtered.append(entry)
         print(f"Default mode: Splitting by top-level sections (Level {min_level}).")
         print("Use --deep to split by all subsections.")
-        toc = [entry for entry in toc if entry[0] == min_level]
+        toc = filtered
     else:
         print("Deep mode: Splitting by all sections.")
 
     # Calculate ranges first
+    # Each section ends one page before the next entry starts; the last runs to the end.
+    starts = [entry[2] - 1 for entry in toc]
+    ends = [s - 1 for s in starts[1:]] + [total_pages - 1]
+
     sections = []
-    for i, entry in enumerate(toc):
-        level, title, start_page = entry
-        start_page_idx = start_page - 1
-        
-        if i < len(toc) - 1:
-            end_page_idx = toc[i+1][2] - 2
-        else:
-            end_page_idx = total_pages - 1
+    for i, (entry, start_page_idx, end_page_idx) in enumerate(zip(toc, starts, ends)):
+        level, title, _ = entry
             
         # For deep usage, sometimes parent and child start on same page.
         # e.g. Ch1 (p1), Sect1.1 (p1).
@@ -80,11 +124,21 @@ def split_pdf_by_toc(input_pdf_path, output_dir, deep=False):
         sections.append({
             "id": i + 1,
             "title": title,
+            "stripped_title": title.strip(),
             "start": start_page_idx,
             "end": end_page_idx,
             "level": level
         })
 
+    # Resolve output paths up front so workers only do PDF work.
+    # Use simple counter for output filename order
+    # Using section['id'] might preserve gaps if excluded, which is fine.
+    # The id prefix is unique, so sanitized titles can't collide.
+    for section in sections:
+        safe_title = sanitize_filename(section['title'])
+        output_filename = f"{section['id']:03d}_{safe_title}.pdf"
+        section['output_path'] = os.path.join(output_dir, output_filename)
+
     # Display sections to user
     print("\nAvailable Sections:")
     print(f"{'ID':<5} | {'Pages':<15} | {'Title'}")
@@ -123,33 +177,40 @@ def split_pdf_by_toc(input_pdf_path, output_dir, deep=False):
             doc.close()
             return
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
 
     print("\nProcessing...")
     
-    count = 0
+    # Collect status lines and print them in one write; workers never print.
+    # Filter once in the parent so workers only receive sections to extract.
+    excluded = frozenset(excluded_ids)
+    messages = []
+    work = []
     for section in sections:
-        if section["id"] in excluded_ids:
-            print(f"Skipping (Excluded): {section['title'].strip()}")
+        if section["id"] in excluded:
+            messages.append(f"Skipping (Excluded): {section['stripped_title']}")
             continue
             
-        print(f"Extracting: '{section['title'].strip()}' (Pages {section['start']+1}-{section['end']+1})")
-        
-        new_doc = fitz.open()
-        new_doc.insert_pdf(doc, from_page=section['start'], to_page=section['end'])
-        
-        safe_title = sanitize_filename(section['title'])
-        # Use simple counter for output filename order
-        # Using section['id'] might preserve gaps if excluded, which is fine.
-        output_filename = f"{section['id']:03d}_{safe_title}.pdf"
-        output_path = os.path.join(output_dir, output_filename)
-        
-        new_doc.save(output_path)
-        new_doc.close()
-        count += 1
+        messages.append(f"Extracting: '{section['stripped_title']}' (Pages {section['start']+1}-{section['end']+1})")
+        work.append(section)
+    if messages:
+        print("\n".join(messages), flush=True)
 
     doc.close()
+
+    count = 0
+    if len(work) == 1 and work[0]['start'] == 0 and work[0]['end'] == total_pages - 1:
+        # The only section is the whole document: copy the file as-is.
+        shutil.copyfile(input_pdf_path, work[0]['output_path'])
+        count = 1
+    elif work:
+        max_workers = min(os.cpu_count() or 1, 4, len(work))
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(pdf_bytes,)) as executor:
+            for _ in executor.map(_extract_section, work):
+                count += 1
+
     print(f"\nDone! Extracted {count} files.")
 
 def main():